@@ -1,20 +1,38 @@
 import time
 import sys
 import os
+from itertools import cycle
 from typing import Optional, Any
-from collections.abc import Iterable, Generator, Callable
+from collections.abc import Iterable
 
 from PBarIter import PBarIter
-from config import _RESET_TF, _RAINBOW
+from config import (
+    _RESET_TF,
+    _RAINBOW,
+    _RAINBOW_CYCLE,
+    _FILL_BUF_LEN,
+    _TERMINAL_WIDTH_TTL,
+    _CLEAR_LINE,
+    _NEXT_LINE,
+    _NEXT_LINE_AND_CLEAR,
+    _CLEAR_AND_DOWN,
+    _CURSOR_UP,
+    _NON_TTY_WIDTH,
+    _NON_TTY_SEP,
+    _NO_TIME_STR,
+)
 
 
 # NPB default class attributes
 _NPB_DEFAULT_CLS_ATT = {
     '_instance': None,
-    '_iterators': (),  # Using a tuple for immutability
+    '_iterators': [],  # Copied on reset so the default is never mutated
     '_pbar_lines_written': 0,
+    '_n_pbars_drawn': 0,
     '_update_interval': None,
     '_default_update_interval': 0.05,
+    '_cached_width': (float('-inf'), 0),
+    '_is_tty': None,
 }
 
 
@@ -39,12 +57,18 @@ class NPB:
     # Stores the running class instance
     _instance: Optional['NPB'] = _NPB_DEFAULT_CLS_ATT['_instance']
     # Stores the iterables whose progress is being evaluated
-    _iterators: tuple[PBarIter, ...] = _NPB_DEFAULT_CLS_ATT['_iterators']
+    _iterators: list[PBarIter] = list(_NPB_DEFAULT_CLS_ATT['_iterators'])
     # Stores the number of progress bar lines currently written
     _pbar_lines_written: int = _NPB_DEFAULT_CLS_ATT['_pbar_lines_written']
+    # Stores the number of progress bars in the last frame written
+    _n_pbars_drawn: int = _NPB_DEFAULT_CLS_ATT['_n_pbars_drawn']
     # How often we update the progress bar and its default value
     _update_interval: Optional[float] = _NPB_DEFAULT_CLS_ATT['_update_interval']
     _default_update_interval: float = _NPB_DEFAULT_CLS_ATT['_default_update_interval']
+    # The terminal width and the time at which it was last queried
+    _cached_width: tuple[float, int] = _NPB_DEFAULT_CLS_ATT['_cached_width']
+    # Whether stdout is a terminal. This is resolved on the first frame written.
+    _is_tty: Optional[bool] = _NPB_DEFAULT_CLS_ATT['_is_tty']
 
     def __new__(cls, iterable, /, *args, **kwargs) -> 'NPB':
         # If disable is True, return the iterable
@@ -131,7 +155,18 @@ class NPB:
             options_dict={'counter': counter, 'timer': timer, 'rate': rate, 'avg_rate': avg_rate},
         )
 
-        cls._iterators = (*self._iterators, iterator)
+        # Resolve the options functions once rather than every frame
+        iterator._option_fns = tuple(
+            fn
+            for opt, fn in (
+                ('counter', self._get_count),
+                ('timer', self._get_elapsed_remaining),
+                ('rate', self._get_iteration_rate),
+                ('avg_rate', self._get_avg_rate),
+            )
+            if iterator._options_dict.get(opt)
+        )
+        cls._iterators.append(iterator)
 
         # Validate update_interval
         try:
@@ -140,6 +175,9 @@ class NPB:
                 cls._update_interval = ui
         except Exception:
             raise TypeError('\'update_interval\' must be a float')
+        # Resolve the update interval once here rather than on every iteration
+        self._ui = cls._update_interval if cls._update_interval is not None else cls._default_update_interval
+        iterator._update_interval = self._ui
         self._last_update = float('-inf')
 
         # Validate disable
@@ -152,87 +190,136 @@ class NPB:
         '''Return an NPB iterator.'''
         return self
 
-    @_handle_NPB_error
     def __next__(self) -> Any:
         '''Get the next item from the most recent iterator, handling updates and terminated progress bars.'''
+        # Errors are handled inline rather than with _handle_NPB_error to avoid an extra call per iteration
         cls = self.__class__
-        raise_se = False
         try:
-            next_item = next(cls._iterators[-1])
-            return next_item
-        except StopIteration:
-            raise_se = True
-        finally:
-            # Always executed
-            curr_time = time.perf_counter()
-            ui = cls._update_interval if cls._update_interval is not None else cls._default_update_interval
-            if curr_time - self._last_update >= ui or raise_se:
-                self._last_update = curr_time
+            iterator = cls._iterators[-1]
+            try:
+                next_item = next(iterator)
+            except StopIteration:
+                # The iterator is exhausted, so write its final state and remove it
+                self._last_update = iterator._time_of_current_it
                 self._write_pbars()
-            if raise_se:
-                cls._iterators = cls._iterators[:-1]
+                cls._iterators.pop()
                 if not cls._iterators:
+                    if cls._is_tty is False:
+                        # Without cursor control the bars share one line, so end it
+                        self._write('\n')
                     self._reset()
-                raise StopIteration
+                raise
+
+            # Only consider a redraw when the iterator has just read the clock
+            if iterator._timed_index != iterator._current_index:
+                return next_item
+
+            # Reuse the timestamp taken by the iterator rather than reading the clock again, and skip the
+            # redraw entirely if the update interval hasn't elapsed
+            curr_time = iterator._time_of_current_it
+            if curr_time - self._last_update < self._ui:
+                return next_item
+            self._last_update = curr_time
+            self._write_pbars()
+            return next_item
+        except StopIteration:
+            raise
+        except Exception:
+            self._reset()
+            raise
 
     def _write_pbars(self) -> None:
         '''Write the progress bars to the terminal.'''
         cls = self.__class__
-        n_iterators = len(cls._iterators)
-
-        extra_lines_needed = n_iterators - cls._pbar_lines_written
-        if extra_lines_needed > 0:
-            sys.stdout.write('\n' * extra_lines_needed)
-            cls._pbar_lines_written += extra_lines_needed
-
-        sys.stdout.write(f'\r\033[{cls._pbar_lines_written}A')  # Move the cursor to the start of the top pbar
-        for i, iterator in enumerate(cls._iterators):
-            # Clear current line after cursor, write the pbar, and move cursor down one and to the start of the line
-            sys.stdout.write(f'\033[K{self._get_pbar_str(iterator)}\033[1B\r')
-            if i == len(cls._iterators) - 1:
-                # Last iterator has been written, so clear lines below
-                for _ in range(cls._pbar_lines_written - i - 1):
-                    sys.stdout.write('\033[K\033[1B')  # Clear current line after cursor and move cursor down 1
-        sys.stdout.flush()
+        # Bind frequently accessed attributes to locals
+        iterators = cls._iterators
+        n_iterators = len(iterators)
+        get_pbar_str = self._get_pbar_str
+        if cls._is_tty is None:
+            isatty = getattr(sys.stdout, 'isatty', None)
+            cls._is_tty = bool(isatty is not None and isatty())
+
+        # Render the pbars, and skip writing entirely if the frame is identical to the last one written
+        pbar_strs = [get_pbar_str(iterator) for iterator in iterators]
+        changed = n_iterators != cls._n_pbars_drawn
+        for iterator, pbar_str in zip(iterators, pbar_strs):
+            if pbar_str != iterator._last_rendered:
+                iterator._last_rendered = pbar_str
+                changed = True
+        if not changed:
+            return
+        cls._n_pbars_drawn = n_iterators
+
+        if not cls._is_tty:
+            # Cursor control isn't available, so overwrite a single line with all the pbars
+            self._write(f'\r{_NON_TTY_SEP.join(pbar_strs)}')
+            return
+
+        # Assemble the whole frame and write it at once to avoid many small writes
+        parts = []
+        lines_written = cls._pbar_lines_written
+        if n_iterators > lines_written:
+            parts.append('\n' * (n_iterators - lines_written))
+            lines_written = cls._pbar_lines_written = n_iterators
+
+        # Move the cursor to the start of the top pbar
+        parts.append(_CURSOR_UP[lines_written] if lines_written < len(_CURSOR_UP) else f'\r\033[{lines_written}A')
+        # Clear each line after the cursor, write its pbar, and move the cursor down one and to the start of the line
+        parts.append(_CLEAR_LINE)
+        parts.append(_NEXT_LINE_AND_CLEAR.join(pbar_strs))
+        parts.append(_NEXT_LINE)
+        # Last iterator has been written, so clear lines below (clear after cursor and move cursor down 1)
+        parts.append(_CLEAR_AND_DOWN * (lines_written - n_iterators))
+
+        self._write(''.join(parts))
 
-    def _get_options(self, iterator: PBarIter) -> Generator[Callable[[PBarIter], str], None, None]:
-        '''A generator yielding the appropriate options functions.'''
-        opt_dict = iterator._options_dict
-        if opt_dict.get('counter'):
-            yield self._get_count
-        if opt_dict.get('timer'):
-            yield self._get_elapsed_remaining
-        if opt_dict.get('rate'):
-            yield self._get_iteration_rate
-        if opt_dict.get('avg_rate'):
-            yield self._get_avg_rate
+    @staticmethod
+    def _write(frame: str) -> None:
+        '''Write a string to stdout and flush it.'''
+        sys.stdout.write(frame)
+        sys.stdout.flush()
 
     def _get_pbar_str(self, iterator: PBarIter) -> str:
         '''Get the whole progress bar string.'''
-        prefix = self._get_desc(iterator)
-        suffix = ' '.join(filter(bool, (f(iterator) for f in self._get_options(iterator))))
+        prefix = iterator._desc_str
+        # None of the options functions return an empty string, so no filtering is needed
+        suffix = ' '.join([f(iterator) for f in iterator._option_fns])
 
-        width = os.get_terminal_size().columns if iterator._ncols is None else iterator._ncols
+        ncols = iterator._ncols
+        width = self._get_terminal_width() if ncols is None else ncols
         pbar_space = width - len(prefix) - bool(prefix) - len(suffix) - bool(suffix)
         pbar = self._get_pbar(iterator, pbar_space)
-        pbar_str = ' '.join(filter(bool, (prefix, pbar, suffix)))
-
-        # Set the color of the progress bar
+        # Join the non-empty components with spaces
+        pbar_str = f'{prefix} {pbar}' if prefix and pbar else prefix or pbar
+        if suffix:
+            pbar_str = f'{pbar_str} {suffix}' if pbar_str else suffix
+
+        # Set the color of the progress bar. Colors are skipped when not writing to a terminal.
+        if not self.__class__._is_tty:
+            return pbar_str
         if iterator._rainbow:
-            pbar_str = ''.join(f'{_RAINBOW[i % len(_RAINBOW)]}{c}' for i, c in enumerate(pbar_str)) + _RESET_TF
-        elif iterator._text_color is not None:
-            pbar_str = f'{iterator._text_color}{pbar_str}{_RESET_TF}'
-        if iterator._bg_color is not None:
-            pbar_str = f'{iterator._bg_color}{pbar_str}{_RESET_TF}'
+            colors = _RAINBOW_CYCLE if len(pbar_str) <= _FILL_BUF_LEN else cycle(_RAINBOW)
+            pbar_str = ''.join([col + c for col, c in zip(colors, pbar_str)]) + _RESET_TF
+        else:
+            text_color = iterator._text_color
+            if text_color is not None:
+                pbar_str = f'{text_color}{pbar_str}{_RESET_TF}'
+        bg_color = iterator._bg_color
+        if bg_color is not None:
+            pbar_str = f'{bg_color}{pbar_str}{_RESET_TF}'
 
         return pbar_str
 
-    @staticmethod
-    def _get_desc(iterator: PBarIter) -> str:
-        '''Get a string of the progress bar iteration.'''
-        if iterator._desc is None:
-            return ''
-        return f'{iterator._desc}:'
+    def _get_terminal_width(self) -> int:
+        '''Get the terminal width, querying the terminal at most once every _TERMINAL_WIDTH_TTL seconds.'''
+        cls = self.__class__
+        if not cls._is_tty:
+            return _NON_TTY_WIDTH
+        query_time, width = cls._cached_width
+        if self._last_update - query_time > _TERMINAL_WIDTH_TTL:
+            width = os.get_terminal_size().columns
+            cls._cached_width = (self._last_update, width)
+        return width
 
     @staticmethod
     def _get_count(iterator: PBarIter) -> str:
@@ -243,15 +330,12 @@ class NPB:
 
     def _get_elapsed_remaining(self, iterator: PBarIter) -> str:
         '''Get a string representing the elapsed and estimated remaining time.'''
-        elapsed_time = proj_time = ''
-        if iterator._it_time_delta is not None:
-            elapsed_time = self._format_time(iterator._time_of_current_it - iterator._start_time)
-            if iterator._len is not None:
-                proj_time = self._format_time((iterator._len - iterator._current_index) * iterator._it_time_delta)
-
-        elapsed_time = elapsed_time or self._format_time(0)
-        proj_time = proj_time or '?'
-
+        if iterator._it_time_delta is None:
+            return _NO_TIME_STR
+        elapsed_time = self._format_time(iterator._time_of_current_it - iterator._start_time)
+        if iterator._len is None:
+            return f'{elapsed_time}<?'
+        proj_time = self._format_time((iterator._len - iterator._current_index) * iterator._it_time_delta)
         return f'{elapsed_time}<{proj_time}'
 
     @staticmethod
@@ -272,7 +356,8 @@ class NPB:
         if iterator._it_time_delta is None:
             rate = '?'
         else:
-            rate = (iterator._time_of_current_it - iterator._start_time) / iterator._current_index
+            # Average over the iterations up to the iterator's last clock reading
+            rate = (iterator._time_of_current_it - iterator._start_time) / iterator._timed_index
             if rate < 1.0:
                 rate = f'{1.0 / rate:.2f}it/s'.rjust(9)
             else:
@@ -285,13 +370,19 @@ class NPB:
         if iterator._len is None:
             return ''
 
-        prop_done = min(iterator._current_index / iterator._len, 1.0)
-        percent = f'{prop_done:.0%}'
+        # Use integer arithmetic for the proportion done, treating an empty iterable as complete
+        length = iterator._len or 1
+        index = min(iterator._current_index, length) if iterator._len else 1
+        percent = f'{100 * index // length}%'
 
         pbar_space = space_avail - len(percent) - 2  # -2 for | chars
 
         if pbar_space > 0:
-            pbar_str = (iterator._fill_char * int(prop_done * pbar_space)).ljust(pbar_space)
+            n_filled = index * pbar_space // length
+            if n_filled <= len(iterator._fill_buf):
+                pbar_str = iterator._fill_buf[:n_filled].ljust(pbar_space)
+            else:
+                pbar_str = (iterator._fill_char * n_filled).ljust(pbar_space)
             return f'{percent}|{pbar_str}|'
         elif pbar_space > -3:
             return percent
@@ -311,9 +402,10 @@ class NPB:
     def _reset(cls) -> None:
         '''Reset the class state so a new instance can be created.'''
         for att, val in _NPB_DEFAULT_CLS_ATT.items():
-            setattr(cls, att, val)
+            setattr(cls, att, val.copy() if isinstance(val, list) else val)
 
-    def __del__(self) -> None:
+    def close(self) -> None:
+        '''Stop tracking all progress bars and reset the class state.'''
         self._reset()
 
     # # TODO: Since each call to NPB() returns the same instance, we can't cancel specific bars,
@@ -324,7 +416,7 @@ class NPB:
     #     if len(cls._iterators) <= 1:
     #         self._reset()
     #     else:
-    #         cls._iterators = cls._iterators[:-1]
+    #         cls._iterators.pop()
 
 
 def nrange(*args, **kwargs):
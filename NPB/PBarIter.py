@@ -2,7 +2,7 @@ import time
 from typing import Optional, Any
 from collections.abc import Iterable
 
-from config import _VALID_COLORS
+from config import _VALID_COLORS, _FILL_BUF_LEN, _UPDATES_PER_BAR
 
 
 class PBarIter:
@@ -37,6 +37,12 @@ class PBarIter:
                     self._len = int(length)
                 except Exception:
                     raise TypeError('\'length\' must be a non-negative integer')
+        # Check for a redraw only every _update_every iterations. This starts at 1 and is adapted to the measured
+        # iteration time, but never exceeds _max_update_every (about 200 checks over the whole iterable).
+        self._max_update_every = max(1, self._len // _UPDATES_PER_BAR) if self._len else 1
+        self._update_every = 1
+        # Clock readings are only batched when the step can exceed 1
+        self._batch_clock_reads = self._max_update_every > 1
 
         # Validate the description
         self._desc = desc
@@ -45,6 +51,8 @@ class PBarIter:
                 raise TypeError('\'desc\' must be a string')
             if len(self._desc) == 0:
                 self._desc = None
+        # Precompute the description prefix so it isn't rebuilt every frame
+        self._desc_str = f'{self._desc}:' if self._desc is not None else ''
 
         # Validate the fill character
         self._fill_char = fill_char
@@ -52,6 +60,8 @@ class PBarIter:
             raise TypeError('\'fill_char\' must be a string of length one')
         if len(self._fill_char) != 1:
             raise ValueError('\'fill_char\' must be a string of length one')
+        # A prebuilt run of fill characters that bars are sliced from
+        self._fill_buf = self._fill_char * _FILL_BUF_LEN
 
         # Validate ncols
         if ncols is not None:
@@ -80,11 +90,18 @@ class PBarIter:
         self._options_dict = options_dict
         if any(not isinstance(opt, bool) for opt in options_dict.values()):
             raise TypeError('Only boolean values are accepted for option arguments')
+        # The functions used to build the options string and the update interval, set by NPB
+        self._option_fns: tuple = ()
+        self._update_interval: float = 0.0
 
         self._time_of_current_it: float = None
         self._it_time_delta: float = None
         self._start_time: float = None
         self._current_index: int = -1
+        self._timed_index: int = -1  # The iteration index at which _time_of_current_it was taken
+        self._next_timed_index: int = 0  # The iteration index at which the clock will next be read
+        # The progress bar string most recently written to the terminal
+        self._last_rendered: str = ''
 
     def __len__(self) -> int | None:
         return self._len
@@ -94,6 +111,9 @@ class PBarIter:
         self._it_time_delta = None
         self._start_time = None
         self._time_of_current_it = None
+        self._timed_index = -1
+        self._next_timed_index = 0
+        self._update_every = 1
         return self
 
     def __next__(self) -> Any:
@@ -103,15 +123,31 @@ class PBarIter:
         except StopIteration:
             raise_se = True
 
+        self._current_index += 1
+
+        # When batching, only read the clock once every _update_every iterations (and at the end). NPB only
+        # checks for redraws on those iterations.
+        if self._batch_clock_reads and not raise_se and self._current_index < self._next_timed_index:
+            return next_item
+
         curr_time = time.perf_counter()
         if self._time_of_current_it is not None:
-            self._it_time_delta = curr_time - self._time_of_current_it
+            if self._batch_clock_reads:
+                # Average the time delta over the iterations since the last reading, and skip as many
+                # iterations before the next reading as fit in the update interval
+                self._it_time_delta = (curr_time - self._time_of_current_it) / (self._current_index - self._timed_index)
+                if self._it_time_delta > 0.0:
+                    self._update_every = max(
+                        1, min(self._max_update_every, int(self._update_interval / self._it_time_delta))
+                    )
+                self._next_timed_index = self._current_index + self._update_every
+            else:
+                self._it_time_delta = curr_time - self._time_of_current_it
         self._time_of_current_it = curr_time
+        self._timed_index = self._current_index
         if self._start_time is None:
             self._start_time = curr_time
 
-        self._current_index += 1
-
         if raise_se:
             raise StopIteration
 
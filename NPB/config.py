@@ -1,3 +1,5 @@
+from itertools import cycle, islice
+
 # Valid text and background colors
 _VALID_COLORS = {
     'black': ('\033[30m', '\033[40m'),
@@ -11,3 +13,19 @@ _VALID_COLORS = {
 }
 _RESET_TF = '\033[0m'  # Resets the typeface to its default
 _RAINBOW = tuple(_VALID_COLORS[c][0] for c in ('red', 'yellow', 'green', 'cyan', 'blue', 'magenta'))
+_FILL_BUF_LEN = 1024  # Length of the precomputed fill and rainbow buffers (covers typical terminal widths)
+_RAINBOW_CYCLE = tuple(islice(cycle(_RAINBOW), _FILL_BUF_LEN))  # Rainbow colors for consecutive characters
+_TERMINAL_WIDTH_TTL = 0.5  # How long (in seconds) a queried terminal width is reused before querying again
+_NO_TIME_STR = '00:00<?'  # The timer string shown before the iteration times are known
+_UPDATES_PER_BAR = 200  # Approximate number of redraw checks over a progress bar of known length
+
+# Cursor control escape sequences
+_CLEAR_LINE = '\033[K'  # Clears the current line after the cursor
+_NEXT_LINE = '\033[1B\r'  # Moves the cursor down one line and to the start of the line
+_NEXT_LINE_AND_CLEAR = _NEXT_LINE + _CLEAR_LINE
+_CLEAR_AND_DOWN = '\033[K\033[1B'  # Clears the current line after the cursor and moves the cursor down one line
+_CURSOR_UP = tuple(f'\r\033[{i}A' for i in range(16))  # Moves the cursor to the start of the line i lines up
+
+# Output settings used when stdout is not a terminal
+_NON_TTY_WIDTH = 80  # The width of each progress bar
+_NON_TTY_SEP = ' | '  # Separates the progress bars on their shared line